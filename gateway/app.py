@@ -5,7 +5,7 @@ Toolsets register themselves via REST API. When the LLM calls a tool,
 the gateway proxies the invocation to the owning toolset's callback URL.
 """
 
-import os, json, re, time, pathlib, asyncio
+import os, re, time, pathlib, asyncio
 from typing import Dict, Any, List, Optional
 from contextlib import asynccontextmanager
 
@@ -13,19 +13,28 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.responses import HTMLResponse
 from pydantic import BaseModel
 import httpx
+import orjson
 import uvicorn
 
-from openai import OpenAI
+from openai import AsyncOpenAI
 
 # ---------------------------------------------------------------------------
 # Config
 # ---------------------------------------------------------------------------
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+# Set to 0 for OpenAI-compatible backends that reject or mishandle parallel tool calls
+PARALLEL_TOOL_CALLS = os.getenv("PARALLEL_TOOL_CALLS", "1") == "1"
 PORT = int(os.getenv("PORT", "8000"))
 
 WEB_DIR = pathlib.Path(__file__).resolve().parent.parent / "web"
 
+
+def _dumps(obj: Any) -> str:
+    """Serialize to a JSON string (orjson; websocket frames and tool messages need str)."""
+    return orjson.dumps(obj).decode()
+
+
 SYSTEM_TEMPLATE = (
     "You are a media analytics assistant for AGF Germany TV audience measurement. "
     "You ONLY answer questions about German TV audience data — reach, market share, "
@@ -62,6 +71,19 @@ class ToolsetRecord:
         self.name = name
         self.callback_url = callback_url
         self.tools = {t.name: t for t in tools}
+        # Schemas and names are static for the lifetime of a registration —
+        # normalize and validate once. Names OpenAI would reject are skipped.
+        self.openai_tools = {
+            t.name: {
+                "type": "function",
+                "function": {
+                    "name": t.name,
+                    "description": t.description,
+                    "parameters": normalize_json_schema(t.parameters),
+                }
+            }
+            for t in self.tools.values() if _VALID_TOOL_NAME.match(t.name)
+        }
         self.registered_at = time.time()
 
 # Global registry
@@ -69,6 +91,10 @@ _registry: Dict[str, ToolsetRecord] = {}
 
 HEARTBEAT_INTERVAL = int(os.getenv("HEARTBEAT_INTERVAL", "15"))  # seconds
 
+# Shared HTTP client for all toolset traffic (created in lifespan). Keeps
+# connections to toolsets alive across tool invocations and heartbeats.
+_http: Optional[httpx.AsyncClient] = None
+
 
 # ---------------------------------------------------------------------------
 # Heartbeat — periodically check if toolsets are still alive
@@ -77,6 +103,11 @@ HEARTBEAT_INTERVAL = int(os.getenv("HEARTBEAT_INTERVAL", "15"))  # seconds
 _heartbeat_failures: Dict[str, int] = {}
 HEARTBEAT_MAX_FAILURES = 3  # remove after 3 consecutive failures
 
+async def _probe_health(health_url: str):
+    resp = await _http.get(health_url, timeout=5.0)
+    resp.raise_for_status()
+
+
 async def _heartbeat_loop():
     """Ping each registered toolset's health endpoint. Remove dead ones."""
     while True:
@@ -84,27 +115,35 @@ async def _heartbeat_loop():
         if not _registry:
             continue
 
+        checks = [
+            (name, record.callback_url.rsplit("/", 1)[0] + "/health")
+            for name, record in _registry.items()
+        ]
+        # Probe all toolsets at once so one unresponsive toolset
+        # doesn't hold up the checks for the others
+        errors = await asyncio.gather(
+            *(_probe_health(health_url) for _, health_url in checks),
+            return_exceptions=True,
+        )
+
         dead = []
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            for name, record in list(_registry.items()):
-                health_url = record.callback_url.rsplit("/", 1)[0] + "/health"
-                try:
-                    resp = await client.get(health_url)
-                    resp.raise_for_status()
-                    # Reset failure count on success
-                    _heartbeat_failures.pop(name, None)
-                except Exception as e:
-                    count = _heartbeat_failures.get(name, 0) + 1
-                    _heartbeat_failures[name] = count
-                    print(f"[Heartbeat] '{name}' check failed ({count}/{HEARTBEAT_MAX_FAILURES}): {health_url} — {type(e).__name__}: {e}", flush=True)
-                    if count >= HEARTBEAT_MAX_FAILURES:
-                        dead.append(name)
-                        print(f"[Heartbeat] Removing '{name}' after {HEARTBEAT_MAX_FAILURES} consecutive failures", flush=True)
+        for (name, health_url), e in zip(checks, errors):
+            if e is None:
+                # Reset failure count on success
+                _heartbeat_failures.pop(name, None)
+                continue
+            count = _heartbeat_failures.get(name, 0) + 1
+            _heartbeat_failures[name] = count
+            print(f"[Heartbeat] '{name}' check failed ({count}/{HEARTBEAT_MAX_FAILURES}): {health_url} — {type(e).__name__}: {e}", flush=True)
+            if count >= HEARTBEAT_MAX_FAILURES:
+                dead.append(name)
+                print(f"[Heartbeat] Removing '{name}' after {HEARTBEAT_MAX_FAILURES} consecutive failures", flush=True)
 
         for name in dead:
             if name in _registry:
                 del _registry[name]
                 _heartbeat_failures.pop(name, None)
+                _invalidate_tool_context()
 
         if dead:
             await broadcast_registry_update()
@@ -158,26 +197,48 @@ def get_openai_tools() -> List[Dict[str, Any]]:
     """Build OpenAI tool definitions from currently registered toolsets."""
     tools = []
     for record in _registry.values():
-        for tdef in record.tools.values():
-            if not _VALID_TOOL_NAME.match(tdef.name):
-                continue
-            tools.append({
-                "type": "function",
-                "function": {
-                    "name": tdef.name,
-                    "description": tdef.description,
-                    "parameters": normalize_json_schema(tdef.parameters),
-                }
-            })
+        tools.extend(record.openai_tools.values())
     return tools
 
 
+# (openai_tools, system_prompt) and the tool name -> owner index for the
+# current registry contents. Rebuilt lazily after a toolset registers or is
+# removed, not on every chat turn or tool call.
+_tool_context: Optional[tuple] = None
+_tool_owners: Optional[Dict[str, ToolsetRecord]] = None
+
+def _invalidate_tool_context():
+    global _tool_context, _tool_owners
+    _tool_context = None
+    _tool_owners = None
+
+
+def get_tool_context() -> tuple:
+    """Return the OpenAI tool list and tool-aware system prompt for this turn."""
+    global _tool_context
+    if _tool_context is None:
+        openai_tools = get_openai_tools()
+        tool_names = [t["function"]["name"] for t in openai_tools]
+        tool_list = "\n".join(f"  - {name}" for name in tool_names)
+        dynamic_system = (
+            SYSTEM_TEMPLATE +
+            f"\nYou have EXACTLY {len(tool_names)} tools available right now:\n{tool_list}\n"
+            "These are the ONLY tools you can use. There are no others."
+        )
+        _tool_context = (openai_tools, dynamic_system)
+    return _tool_context
+
+
 def find_tool_owner(tool_name: str) -> Optional[ToolsetRecord]:
     """Find which toolset owns a given tool."""
-    for record in _registry.values():
-        if tool_name in record.tools:
-            return record
-    return None
+    global _tool_owners
+    if _tool_owners is None:
+        _tool_owners = {}
+        for record in _registry.values():
+            for name in record.tools:
+                # First registered toolset wins, as with a linear scan
+                _tool_owners.setdefault(name, record)
+    return _tool_owners.get(tool_name)
 
 
 async def invoke_tool(tool_name: str, args: Dict[str, Any]) -> Dict[str, Any]:
@@ -186,13 +247,21 @@ async def invoke_tool(tool_name: str, args: Dict[str, Any]) -> Dict[str, Any]:
     if not owner:
         return {"error": f"Tool '{tool_name}' not found in any registered toolset"}
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        resp = await client.post(
-            owner.callback_url,
-            json={"tool_name": tool_name, "arguments": args},
-        )
-        resp.raise_for_status()
-        return resp.json()
+    resp = await _http.post(
+        owner.callback_url,
+        content=orjson.dumps({"tool_name": tool_name, "arguments": args}),
+        headers={"Content-Type": "application/json"},
+    )
+    resp.raise_for_status()
+    return orjson.loads(resp.content)
+
+
+async def _invoke_indexed(index: int, tool_name: str, args: Dict[str, Any]) -> tuple:
+    """invoke_tool for concurrent dispatch: returns (index, result), errors as results."""
+    try:
+        return index, await invoke_tool(tool_name, args)
+    except Exception as e:
+        return index, {"error": str(e)}
 
 
 # ---------------------------------------------------------------------------
@@ -200,9 +269,15 @@ async def invoke_tool(tool_name: str, args: Dict[str, Any]) -> Dict[str, Any]:
 # ---------------------------------------------------------------------------
 @asynccontextmanager
 async def lifespan(app):
+    global _http
+    _http = httpx.AsyncClient(
+        timeout=30.0,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+    )
     task = asyncio.create_task(_heartbeat_loop())
     yield
     task.cancel()
+    await _http.aclose()
 
 app = FastAPI(title="AGF Media Measurement Gateway", lifespan=lifespan)
 
@@ -212,13 +287,18 @@ app = FastAPI(title="AGF Media Measurement Gateway", lifespan=lifespan)
 @app.post("/api/register")
 async def register_toolset(reg: ToolsetRegistration):
     """Register a toolset with the gateway."""
-    _registry[reg.toolset_name] = ToolsetRecord(
+    record = ToolsetRecord(
         name=reg.toolset_name,
         callback_url=reg.callback_url,
         tools=reg.tools,
     )
+    _registry[reg.toolset_name] = record
+    _invalidate_tool_context()
     tool_names = [t.name for t in reg.tools]
     print(f"[Registry] Registered toolset '{reg.toolset_name}' with tools: {tool_names}")
+    skipped = [n for n in tool_names if n not in record.openai_tools]
+    if skipped:
+        print(f"[Registry] Tools with invalid names will not be offered to the LLM: {skipped}")
     # Notify connected WebSocket clients
     await broadcast_registry_update()
     return {"status": "registered", "toolset": reg.toolset_name, "tools": tool_names}
@@ -229,6 +309,7 @@ async def deregister_toolset(toolset_name: str):
     """Deregister a toolset from the gateway."""
     if toolset_name in _registry:
         del _registry[toolset_name]
+        _invalidate_tool_context()
         print(f"[Registry] Deregistered toolset '{toolset_name}'")
         await broadcast_registry_update()
         return {"status": "deregistered", "toolset": toolset_name}
@@ -272,7 +353,7 @@ async def broadcast_registry_update():
     for name, record in _registry.items():
         toolsets_info[name] = [t.name for t in record.tools.values()]
 
-    msg = json.dumps({
+    msg = _dumps({
         "type": "registry_update",
         "toolsets": toolsets_info,
         "total_tools": sum(len(tools) for tools in toolsets_info.values()),
@@ -295,7 +376,7 @@ async def websocket_chat(ws: WebSocket):
     # Send initial registry state
     await broadcast_registry_update()
 
-    client = OpenAI(api_key=OPENAI_API_KEY)
+    client = AsyncOpenAI(api_key=OPENAI_API_KEY)
     messages: List[Dict[str, Any]] = [
         {"role": "system", "content": SYSTEM_TEMPLATE},
     ]
@@ -303,40 +384,34 @@ async def websocket_chat(ws: WebSocket):
     try:
         while True:
             data = await ws.receive_text()
-            user_msg = json.loads(data).get("message", "").strip()
+            user_msg = orjson.loads(data).get("message", "").strip()
             if not user_msg:
                 continue
 
             messages.append({"role": "user", "content": user_msg})
-            await ws.send_text(json.dumps({"type": "status", "content": "Thinking..."}))
+            await ws.send_text(_dumps({"type": "status", "content": "Thinking..."}))
 
             # Discover currently registered tools
-            openai_tools = get_openai_tools()
+            openai_tools, dynamic_system = get_tool_context()
 
             if not openai_tools:
                 messages.append({"role": "assistant", "content": "No measurement tools are currently available. No toolsets have registered with the gateway yet."})
-                await ws.send_text(json.dumps({
+                await ws.send_text(_dumps({
                     "type": "assistant",
                     "content": "No measurement tools are currently available. No toolsets have registered with the gateway yet. Please start a toolset service.",
                 }))
                 continue
 
             # Inject available tools into system context
-            tool_names = [t["function"]["name"] for t in openai_tools]
-            tool_list = "\n".join(f"  - {name}" for name in tool_names)
-            dynamic_system = (
-                SYSTEM_TEMPLATE +
-                f"\nYou have EXACTLY {len(tool_names)} tools available right now:\n{tool_list}\n"
-                "These are the ONLY tools you can use. There are no others."
-            )
             messages[0] = {"role": "system", "content": dynamic_system}
 
             # Multi-turn tool loop (max 6 hops)
             for _ in range(6):
-                resp = client.chat.completions.create(
+                resp = await client.chat.completions.create(
                     model=OPENAI_MODEL,
                     messages=messages,
                     tools=openai_tools,
+                    parallel_tool_calls=PARALLEL_TOOL_CALLS,
                 )
                 msg = resp.choices[0].message
                 tool_calls = getattr(msg, "tool_calls", None)
@@ -344,7 +419,7 @@ async def websocket_chat(ws: WebSocket):
                 if not tool_calls:
                     answer = msg.content or ""
                     messages.append({"role": "assistant", "content": answer})
-                    await ws.send_text(json.dumps({"type": "assistant", "content": answer}))
+                    await ws.send_text(_dumps({"type": "assistant", "content": answer}))
                     break
 
                 messages.append({
@@ -353,38 +428,46 @@ async def websocket_chat(ws: WebSocket):
                     "tool_calls": tool_calls,
                 })
 
+                parsed = []
                 for tc in tool_calls:
-                    fname = tc.function.name
                     try:
-                        args = json.loads(tc.function.arguments or "{}")
+                        args = orjson.loads(tc.function.arguments or "{}")
                     except Exception:
                         args = {}
+                    parsed.append((tc, args))
 
-                    await ws.send_text(json.dumps({
+                    await ws.send_text(_dumps({
                         "type": "tool_call",
-                        "name": fname,
+                        "name": tc.function.name,
                         "args": args,
                     }))
 
-                    try:
-                        result = await invoke_tool(fname, args)
-                    except Exception as e:
-                        result = {"error": str(e)}
-
-                    await ws.send_text(json.dumps({
+                # Tool calls within a hop are independent — dispatch them
+                # concurrently and show each result as soon as it arrives
+                results: List[Any] = [None] * len(parsed)
+                pending = [
+                    _invoke_indexed(i, tc.function.name, args)
+                    for i, (tc, args) in enumerate(parsed)
+                ]
+                for next_done in asyncio.as_completed(pending):
+                    i, result = await next_done
+                    results[i] = result
+                    await ws.send_text(_dumps({
                         "type": "tool_result",
-                        "name": fname,
+                        "name": parsed[i][0].function.name,
                         "result": result,
                     }))
 
+                # Append tool messages in the original call order
+                for (tc, _), result in zip(parsed, results):
                     messages.append({
                         "role": "tool",
                         "tool_call_id": tc.id,
-                        "name": fname,
-                        "content": json.dumps(result),
+                        "name": tc.function.name,
+                        "content": _dumps(result),
                     })
             else:
-                await ws.send_text(json.dumps({
+                await ws.send_text(_dumps({
                     "type": "assistant",
                     "content": "Reached tool-call limit. Please try a more specific question.",
                 }))
@@ -392,6 +475,8 @@ async def websocket_chat(ws: WebSocket):
     except WebSocketDisconnect:
         if ws in _ws_clients:
             _ws_clients.remove(ws)
+    finally:
+        await client.close()
 
 
 if __name__ == "__main__":
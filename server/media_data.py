@@ -13,6 +13,9 @@ Calibrated to real-world German TV audience ranges:
 """
 
 import hashlib
+import heapq
+from functools import lru_cache
+from operator import itemgetter
 from typing import Optional
 
 # ---------------------------------------------------------------------------
@@ -115,6 +118,15 @@ PROGRAMS = {
 # ---------------------------------------------------------------------------
 GENRES = sorted(set(p["genre"] for p in PROGRAMS.values()))
 
+# Program names per channel / genre (derived once, in PROGRAMS order) so
+# aggregate queries don't rescan every program on each call
+PROGRAMS_BY_CHANNEL = {
+    ch: [k for k, v in PROGRAMS.items() if v["channel"] == ch] for ch in CHANNELS
+}
+PROGRAMS_BY_GENRE = {
+    g: [k for k, v in PROGRAMS.items() if v["genre"] == g] for g in GENRES
+}
+
 # ---------------------------------------------------------------------------
 # Demographic bias matrices
 # ---------------------------------------------------------------------------
@@ -173,11 +185,13 @@ STREAMING_BASE_FRACTION = 0.12  # streaming adds ~12% of linear reach on average
 # Deterministic seed helper
 # ---------------------------------------------------------------------------
 
+@lru_cache(maxsize=8192)
 def _seed(*parts) -> float:
     """Hash arbitrary inputs to a deterministic float in [0, 1)."""
-    key = "|".join(str(p) for p in parts).lower()
-    h = hashlib.md5(key.encode("utf-8")).hexdigest()
-    return int(h[:8], 16) / 0xFFFFFFFF
+    key = "|".join(map(str, parts)).lower()
+    # First 4 digest bytes as a big-endian int == int(hexdigest()[:8], 16)
+    h = hashlib.md5(key.encode("utf-8")).digest()
+    return int.from_bytes(h[:4], "big") / 0xFFFFFFFF
 
 
 def _jitter(seed_val: float, low: float = 0.88, high: float = 1.12) -> float:
@@ -212,6 +226,10 @@ def _demo_multiplier(genre: str, channel: str, age_group: Optional[str], gender:
     return m
 
 
+# compute_reach / compute_share are pure functions of their arguments and are
+# called repeatedly by the aggregate tools below, so results are memoized.
+# Cached dicts are shared between callers — treat them as read-only.
+@lru_cache(maxsize=4096)
 def compute_reach(program_name: str, age_group: Optional[str] = None,
                   gender: Optional[str] = None) -> dict:
     """Compute reach metrics for a program + demographic slice."""
@@ -253,6 +271,7 @@ def compute_reach(program_name: str, age_group: Optional[str] = None,
     }
 
 
+@lru_cache(maxsize=4096)
 def compute_share(entity_name: str, entity_type: str = "channel",
                   age_group: Optional[str] = None, gender: Optional[str] = None) -> dict:
     """Compute market share for a channel or program."""
@@ -261,11 +280,12 @@ def compute_share(entity_name: str, entity_type: str = "channel",
         if not ch:
             return {"error": f"Channel '{entity_name}' not found"}
         # Aggregate: average share of programs on this channel
-        ch_progs = {k: v for k, v in PROGRAMS.items() if v["channel"] == entity_name}
+        ch_progs = PROGRAMS_BY_CHANNEL.get(entity_name)
         if not ch_progs:
             return {"error": f"No programs found for channel '{entity_name}'"}
         shares = []
-        for pname, pdata in ch_progs.items():
+        for pname in ch_progs:
+            pdata = PROGRAMS[pname]
             demo_mult = _demo_multiplier(pdata["genre"], entity_name, age_group, gender)
             jit = _jitter(_seed("share", pname, age_group, gender))
             shares.append(pdata["base_share"] * demo_mult * jit)
@@ -297,7 +317,7 @@ def compute_share(entity_name: str, entity_type: str = "channel",
 def compute_genre_performance(genre: str, age_group: Optional[str] = None,
                               gender: Optional[str] = None) -> dict:
     """Aggregate reach and share for all programs in a genre."""
-    genre_progs = {k: v for k, v in PROGRAMS.items() if v["genre"] == genre}
+    genre_progs = PROGRAMS_BY_GENRE.get(genre)
     if not genre_progs:
         return {"error": f"Genre '{genre}' not found. Available: {GENRES}"}
 
@@ -307,7 +327,7 @@ def compute_genre_performance(genre: str, age_group: Optional[str] = None,
         s = compute_share(pname, "program", age_group, gender)
         results.append({
             "program": pname,
-            "channel": genre_progs[pname]["channel"],
+            "channel": r["channel"],
             "reach_thousands": r["reach_thousands"],
             "reach_percent": r["reach_percent"],
             "market_share_percent": s["market_share_percent"],
@@ -337,16 +357,16 @@ def compute_top_programs(metric: str = "reach", n: int = 10,
         s = compute_share(pname, "program", age_group, gender)
         rows.append({
             "program": pname,
-            "channel": PROGRAMS[pname]["channel"],
-            "genre": PROGRAMS[pname]["genre"],
+            "channel": r["channel"],
+            "genre": r["genre"],
             "reach_thousands": r["reach_thousands"],
             "reach_percent": r["reach_percent"],
             "market_share_percent": s["market_share_percent"],
         })
 
     sort_key = "reach_thousands" if metric == "reach" else "market_share_percent"
-    rows.sort(key=lambda x: x[sort_key], reverse=True)
-    return rows[:n]
+    # Partial selection; same order (ties included) as sorting and slicing
+    return heapq.nlargest(n, rows, key=itemgetter(sort_key))
 
 
 def compute_demographic_breakdown(entity_name: str, entity_type: str = "program") -> dict:
@@ -396,7 +416,7 @@ def compute_cross_media(entity_name: str, entity_type: str = "program",
         tv_reach = tv["reach_thousands"]
     else:
         # For channels, sum program reaches
-        ch_progs = [k for k, v in PROGRAMS.items() if v["channel"] == entity_name]
+        ch_progs = PROGRAMS_BY_CHANNEL.get(entity_name)
         if not ch_progs:
             return {"error": f"Channel '{entity_name}' not found or has no programs"}
         tv_reach = sum(compute_reach(p, age_group, gender)["reach_thousands"] for p in ch_progs)
@@ -426,3 +446,15 @@ def compute_cross_media(entity_name: str, entity_type: str = "program",
         "total_reach_thousands": total_reach,
         "total_reach_percent": round(total_reach / universe * 100, 2),
     }
+
+
+# ---------------------------------------------------------------------------
+# Cache observability
+# ---------------------------------------------------------------------------
+
+def cache_stats() -> dict:
+    """Hit/miss counters for the memoized computations."""
+    return {
+        fn.__name__: fn.cache_info()._asdict()
+        for fn in (compute_reach, compute_share, _seed)
+    }
@@ -14,17 +14,20 @@ On startup, registers with the gateway. On shutdown, deregisters.
 import os, sys, pathlib, asyncio
 
 from fastapi import FastAPI
+from fastapi.responses import Response
 from pydantic import BaseModel
 import httpx
+import orjson
 import uvicorn
 
 # Add server/ to path for media_data imports
 sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / "server"))
 
 from media_data import (
-    CHANNELS, PROGRAMS, GENRES, AGE_GROUPS, GENDERS,
+    CHANNELS, PROGRAMS, GENRES, AGE_GROUPS, GENDERS, PROGRAMS_BY_CHANNEL,
     compute_reach, compute_share, compute_genre_performance,
     compute_top_programs, compute_demographic_breakdown, compute_cross_media,
+    cache_stats,
 )
 
 # ---------------------------------------------------------------------------
@@ -213,7 +216,7 @@ def handle_compare_channels(args: dict) -> dict:
         if metric == "share":
             data = compute_share(ch, "channel", age_group, gender)
         else:
-            ch_progs = [k for k, v in PROGRAMS.items() if v["channel"] == ch]
+            ch_progs = PROGRAMS_BY_CHANNEL[ch]
             total_reach = sum(
                 compute_reach(p, age_group, gender)["reach_thousands"]
                 for p in ch_progs
@@ -323,15 +326,21 @@ class InvokeRequest(BaseModel):
     arguments: dict = {}
 
 
+# Plain def: FastAPI runs it in its threadpool, so computing a tool result
+# doesn't block the event loop serving /health and other requests.
 @app.post("/invoke")
-async def invoke_tool(req: InvokeRequest):
+def invoke_tool(req: InvokeRequest):
     handler = TOOL_HANDLERS.get(req.tool_name)
     if not handler:
-        return {"error": f"Tool '{req.tool_name}' not found in {TOOLSET_NAME}"}
-    try:
-        return handler(req.arguments)
-    except Exception as e:
-        return {"error": str(e)}
+        result = {"error": f"Tool '{req.tool_name}' not found in {TOOLSET_NAME}"}
+    else:
+        try:
+            result = handler(req.arguments)
+        except Exception as e:
+            result = {"error": str(e)}
+    # Results are plain JSON types — serialize with orjson directly rather
+    # than through FastAPI's jsonable_encoder + json.dumps
+    return Response(content=orjson.dumps(result), media_type="application/json")
 
 
 @app.get("/health")
@@ -339,6 +348,11 @@ async def health():
     return {"ok": True, "toolset": TOOLSET_NAME, "tools": list(TOOL_HANDLERS.keys())}
 
 
+@app.get("/cache_stats")
+async def get_cache_stats():
+    return {"toolset": TOOLSET_NAME, "caches": cache_stats()}
+
+
 if __name__ == "__main__":
     print(f"Starting {TOOLSET_NAME} toolset on port {PORT}")
     print(f"  Gateway: {GATEWAY_URL}")
@@ -14,8 +14,10 @@ import os, sys, signal, pathlib, asyncio
 from typing import Optional
 
 from fastapi import FastAPI
+from fastapi.responses import Response
 from pydantic import BaseModel
 import httpx
+import orjson
 import uvicorn
 
 # Add server/ to path for media_data imports
@@ -23,7 +25,8 @@ sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / "server"
 
 from media_data import (
     CHANNELS, PROGRAMS, GENRES, AGE_GROUPS, GENDERS,
-    compute_reach, compute_share,
+    PROGRAMS_BY_CHANNEL, PROGRAMS_BY_GENRE,
+    compute_reach, compute_share, cache_stats,
 )
 
 # ---------------------------------------------------------------------------
@@ -127,10 +130,16 @@ def handle_list_channels(args: dict) -> dict:
 def handle_list_programs(args: dict) -> dict:
     channel = args.get("channel")
     genre = args.get("genre")
+    # Start from the narrower precomputed index instead of scanning every program
+    if channel:
+        names = PROGRAMS_BY_CHANNEL.get(channel, [])
+    elif genre:
+        names = PROGRAMS_BY_GENRE.get(genre, [])
+    else:
+        names = PROGRAMS
     result = []
-    for name, info in PROGRAMS.items():
-        if channel and info["channel"] != channel:
-            continue
+    for name in names:
+        info = PROGRAMS[name]
         if genre and info["genre"] != genre:
             continue
         result.append({
@@ -250,15 +259,21 @@ class InvokeRequest(BaseModel):
     arguments: dict = {}
 
 
+# Plain def: FastAPI runs it in its threadpool, so computing a tool result
+# doesn't block the event loop serving /health and other requests.
 @app.post("/invoke")
-async def invoke_tool(req: InvokeRequest):
+def invoke_tool(req: InvokeRequest):
     handler = TOOL_HANDLERS.get(req.tool_name)
     if not handler:
-        return {"error": f"Tool '{req.tool_name}' not found in {TOOLSET_NAME}"}
-    try:
-        return handler(req.arguments)
-    except Exception as e:
-        return {"error": str(e)}
+        result = {"error": f"Tool '{req.tool_name}' not found in {TOOLSET_NAME}"}
+    else:
+        try:
+            result = handler(req.arguments)
+        except Exception as e:
+            result = {"error": str(e)}
+    # Results are plain JSON types — serialize with orjson directly rather
+    # than through FastAPI's jsonable_encoder + json.dumps
+    return Response(content=orjson.dumps(result), media_type="application/json")
 
 
 @app.get("/health")
@@ -266,6 +281,11 @@ async def health():
     return {"ok": True, "toolset": TOOLSET_NAME, "tools": list(TOOL_HANDLERS.keys())}
 
 
+@app.get("/cache_stats")
+async def get_cache_stats():
+    return {"toolset": TOOLSET_NAME, "caches": cache_stats()}
+
+
 if __name__ == "__main__":
     print(f"Starting {TOOLSET_NAME} toolset on port {PORT}")
     print(f"  Gateway: {GATEWAY_URL}")